@@ -0,0 +1,61 @@
+/**
+ * Small in-memory LRU cache with a per-entry TTL.
+ * Map insertion order doubles as recency order, so the first key is always
+ * the least recently used one.
+ */
+export class TtlCache<V> {
+  private readonly entries = new Map<string, { value: V; expires: number }>();
+  private readonly maxSize: number;
+  private readonly ttlMs: number;
+
+  constructor(maxSize: number, ttlMs: number = Infinity) {
+    this.maxSize = maxSize;
+    this.ttlMs = ttlMs;
+  }
+
+  get(key: string): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+    this.entries.delete(key);
+    if (entry.expires <= Date.now()) return undefined;
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  set(key: string, value: V): void {
+    this.entries.delete(key);
+    this.entries.set(key, { value, expires: Date.now() + this.ttlMs });
+    if (this.entries.size > this.maxSize) {
+      const oldest = this.entries.keys().next();
+      if (!oldest.done) this.entries.delete(oldest.value);
+    }
+  }
+
+  delete(key: string, value?: V): void {
+    if (value === undefined || this.entries.get(key)?.value === value) {
+      this.entries.delete(key);
+    }
+  }
+
+  clear(): void {
+    this.entries.clear();
+  }
+}
+
+/**
+ * Return the cached promise for `key`, or start `load` and cache its promise.
+ * Concurrent callers on a cold key share one in-flight load; rejected loads
+ * are evicted so the next call retries.
+ */
+export function cachedLoad<T>(
+  cache: TtlCache<Promise<T>>,
+  key: string,
+  load: () => Promise<T>,
+): Promise<T> {
+  const hit = cache.get(key);
+  if (hit) return hit;
+  const pending = load();
+  cache.set(key, pending);
+  pending.catch(() => cache.delete(key, pending));
+  return pending;
+}
@@ -17,10 +17,13 @@ type Depth = "low" | "medium" | "high";
 const FetchDocsInputSchema = z
   .object({
     target: z
-      .string()
-      .min(1)
-      .max(200)
-      .describe("Library or framework name (e.g. 'react', 'langchain', 'express')."),
+      .union([
+        z.string().min(1).max(200),
+        z.array(z.string().min(1).max(200)).min(1).max(10),
+      ])
+      .describe(
+        "Library or framework name (e.g. 'react', 'langchain', 'express'), or an array of names (max 10) to fetch together.",
+      ),
     tag: z
       .string()
       .max(200)
@@ -39,6 +42,10 @@ const FetchDocsInputSchema = z
       .boolean()
       .default(false)
       .describe("Optional; if true, list matching libraries instead of fetching docs."),
+    refresh: z
+      .boolean()
+      .default(false)
+      .describe("Optional; drop cached Context7 results and re-fetch."),
   })
   .strict();
 
@@ -65,26 +72,35 @@ const FetchSiteInputSchema = z
 
 type FetchSiteInput = z.infer<typeof FetchSiteInputSchema>;
 
-const AskDocsAgentInputSchema = z.object({
-  query: z
-    .string()
-    .min(5)
-    .max(500)
-    .describe("Question to answer over this documentation (5–500 chars)."),
-  reference: z
-    .string()
-    .min(1)
-    .max(100)
-    .describe("Documentation store name (see docs://targets resource)."),
-  include_sources: z
-    .boolean()
-    .default(false)
-    .describe("Optional; include source chunk previews in response."),
-  format: z
-    .enum(["markdown", "json"])
-    .default("markdown")
-    .describe("Optional; response format: 'markdown' or 'json'."),
-});
+const AskDocsAgentInputSchema = z
+  .object({
+    query: z
+      .union([
+        z.string().min(5).max(500),
+        z.array(z.string().min(5).max(500)).min(1).max(5),
+      ])
+      .describe(
+        "Question to answer over this documentation (5–500 chars), or an array of up to 5 questions asked together.",
+      ),
+    reference: z
+      .string()
+      .min(1)
+      .max(100)
+      .describe("Documentation store name (see docs://targets resource)."),
+    include_sources: z
+      .boolean()
+      .default(false)
+      .describe("Optional; include source chunk previews in response."),
+    format: z
+      .enum(["markdown", "json"])
+      .default("markdown")
+      .describe("Optional; response format: 'markdown' or 'json'."),
+    refresh: z
+      .boolean()
+      .default(false)
+      .describe("Optional; re-list stores and skip cached answers."),
+  })
+  .strict();
 
 // ---------------------------------------------------------------------------
 // Main MCP Server Setup
@@ -120,10 +136,10 @@ async function main(): Promise<void> {
         depth: (args.depth ?? "medium") as Depth,
         version: args.version,
         browse_index: args.browse_index ?? false,
+        refresh: args.refresh ?? false,
       };
       const result = await fetchDocsTool(params);
-      const isError = result.startsWith("# API Error") || result.startsWith("Error ");
-      return { content: [{ type: "text", text: result }], isError };
+      return { content: [{ type: "text", text: result.text }], isError: result.isError };
     },
   );
 
@@ -145,8 +161,7 @@ async function main(): Promise<void> {
         refresh: args.refresh ?? false,
       };
       const result = await fetchSiteTool(params);
-      const isError = result.startsWith("Error ") || result.includes("Error fetching");
-      return { content: [{ type: "text", text: result }], isError };
+      return { content: [{ type: "text", text: result.text }], isError: result.isError };
     },
   );
 
@@ -171,10 +186,10 @@ async function main(): Promise<void> {
           include_chunks: args.include_sources ?? false,
           top_k: 5,
           format: (args.format ?? "markdown") as "markdown" | "json",
+          force_refresh: args.refresh ?? false,
         };
         const result = await askDocsAgentTool(geminiClient!, params);
-        const isError = result.includes("Error:") || result.startsWith("Error ");
-        return { content: [{ type: "text", text: result }], isError };
+        return { content: [{ type: "text", text: result.text }], isError: result.isError };
       },
     );
 
@@ -1,17 +1,41 @@
-import { GoogleGenAI } from "@google/genai";
+import {
+  GenerateContentConfig,
+  GenerateContentResponse,
+  GoogleGenAI,
+} from "@google/genai";
+
+import { TtlCache, cachedLoad } from "../cache.js";
+import type { ToolResult } from "../types.js";
 
 const CHARACTER_LIMIT = 25_000;
 const GEMINI_MODEL = "gemini-2.5-flash";
 const STORE_CACHE_TTL = 300_000;
+// JSON responses are read by programs, so emit them compact unless
+// ASK_DOCS_PRETTY_JSON=1 asks for 2-space indentation.
+const JSON_INDENT = process.env.ASK_DOCS_PRETTY_JSON === "1" ? 2 : undefined;
+const CONFIG_CACHE_SIZE = 32;
+const ANSWER_CACHE_SIZE = 128;
+const ANSWER_CACHE_TTL = 600_000;
+// Grounding chunks arrive most-relevant first; sources are only gathered
+// from this many leading chunks (or top_k, if larger).
+const SOURCE_SCAN_LIMIT = 20;
+// Room kept back from each batched answer's share of CHARACTER_LIMIT for
+// the separator or JSON nesting that joins it to the others.
+const BATCH_ENTRY_OVERHEAD = 256;
 
 export interface AskDocsAgentParams {
-  query: string;
-  reference: string;
-  top_k: number;
-  include_chunks: boolean;
-  format: "markdown" | "json";
-  metadata_filter?: string;
-  force_refresh?: boolean;
+  readonly query: string | readonly string[];
+  readonly reference: string;
+  readonly top_k: number;
+  readonly include_chunks: boolean;
+  readonly format: "markdown" | "json";
+  readonly metadata_filter?: string;
+  readonly force_refresh?: boolean;
+}
+
+/** One question out of a (possibly batched) ask_docs_agent call. */
+interface AskQuery extends Omit<AskDocsAgentParams, "query"> {
+  readonly query: string;
 }
 
 export interface StoreInfo {
@@ -27,7 +51,11 @@ interface StoreCache {
   timestamp: number;
 }
 
+// Process-wide: the MCP server builds one GoogleGenAI client at startup, so
+// every tool call and resource read shares this listing for the TTL.
 let storeCache: StoreCache | null = null;
+// In-flight listing shared by every caller that misses the cache meanwhile.
+let pendingStoreFetch: Promise<StoreCache> | null = null;
 
 async function fetchStores(client: GoogleGenAI): Promise<StoreCache> {
   const pager = await client.fileSearchStores.list({ config: { pageSize: 20 } });
@@ -62,10 +90,75 @@ async function getStores(
   if (!forceRefresh && storeCache && now - storeCache.timestamp < STORE_CACHE_TTL) {
     return storeCache;
   }
-  storeCache = await fetchStores(client);
+  if (!pendingStoreFetch) {
+    pendingStoreFetch = fetchStores(client).finally(() => {
+      pendingStoreFetch = null;
+    });
+  }
+  const fresh = await pendingStoreFetch;
+  if (!storeCache || fresh.timestamp >= storeCache.timestamp) {
+    storeCache = fresh;
+  }
   return storeCache;
 }
 
+// Only the store and metadata filter vary between calls, so the nested
+// config objects are built once per pair and reused.
+const configCache = new TtlCache<GenerateContentConfig>(CONFIG_CACHE_SIZE);
+
+// Gemini responses per store, filter and normalized query. Asking the same
+// question again (common while iterating) skips the retrieval + generation
+// round-trip; top_k, include_chunks and format only affect rendering, so
+// they share an entry. Failed calls are not kept.
+const answerCache = new TtlCache<Promise<GenerateContentResponse>>(
+  ANSWER_CACHE_SIZE,
+  ANSWER_CACHE_TTL,
+);
+
+function normalizeQuery(query: string): string {
+  return query.trim().replace(/\s+/g, " ").toLowerCase();
+}
+
+function generateAnswer(
+  client: GoogleGenAI,
+  storeName: string,
+  params: AskQuery,
+): Promise<GenerateContentResponse> {
+  const key =
+    `${storeName}\n${params.metadata_filter ?? ""}\n${normalizeQuery(params.query)}`;
+  if (params.force_refresh) answerCache.delete(key);
+  return cachedLoad(answerCache, key, () =>
+    client.models.generateContent({
+      model: GEMINI_MODEL,
+      contents: params.query,
+      config: getSearchConfig(storeName, params.metadata_filter),
+    }),
+  );
+}
+
+function getSearchConfig(
+  storeName: string,
+  metadataFilter: string | undefined,
+): GenerateContentConfig {
+  const key = `${storeName}\n${metadataFilter ?? ""}`;
+  let config = configCache.get(key);
+  if (!config) {
+    config = {
+      tools: [
+        {
+          fileSearch: {
+            fileSearchStoreNames: [storeName],
+            ...(metadataFilter && { metadataFilter }),
+          },
+        },
+      ],
+      temperature: 0.0,
+    };
+    configCache.set(key, config);
+  }
+  return config;
+}
+
 /**
  * Get available documentation references.
  * Returns a list of store info objects with display names and metadata.
@@ -77,90 +170,112 @@ export async function getAvailableStores(
   return cache.storeList;
 }
 
-function formatAskMarkdown(
-  params: AskDocsAgentParams,
-  mainResponse: string,
-  grounding: any,
-): string {
-  const CHUNK_CHAR_LIMIT = 500;
-  const output: string[] = [];
-  output.push(`# Search Results: ${params.reference}\n\n`);
-  output.push(`**Query**: ${params.query}\n\n`);
-  output.push(`**Response**:\n${mainResponse}\n\n`);
+// Per-request values are read-only once built; chunk objects are always
+// created with the same property order so V8 keeps them on one hidden class.
+interface GroundingChunk {
+  readonly index: number;
+  readonly title: string | undefined;
+  readonly text: string;
+}
+
+interface ParsedGrounding {
+  readonly sources: readonly string[];
+  readonly chunks: readonly GroundingChunk[];
+}
 
-  const chunks = grounding.groundingChunks || [];
+/**
+ * Collect source titles and the first `topK` retrieved chunks in one pass
+ * over the leading grounding chunks, reading each retrievedContext only once.
+ * Chunks are only built when the caller will render them.
+ */
+function parseGroundingMetadata(
+  grounding: any,
+  topK: number,
+  includeChunks: boolean,
+): ParsedGrounding {
+  const rawChunks: any[] = grounding.groundingChunks || [];
+  const chunkLimit = includeChunks ? topK : 0;
+  const scanLimit = Math.min(
+    rawChunks.length,
+    Math.max(chunkLimit, SOURCE_SCAN_LIMIT),
+  );
   const sources = new Set<string>();
-  for (const chunk of chunks) {
-    if (chunk.retrievedContext?.title) {
-      sources.add(chunk.retrievedContext.title);
+  const chunks: GroundingChunk[] = [];
+
+  for (let i = 0; i < scanLimit; i++) {
+    const ctx = rawChunks[i].retrievedContext;
+    if (!ctx) continue;
+    if (ctx.title) sources.add(ctx.title);
+    if (i < chunkLimit) {
+      chunks.push({ index: i, title: ctx.title, text: ctx.text ?? "" });
     }
   }
 
-  output.push("---\n\n");
-  output.push(`**Sources** (${sources.size} files):\n`);
-  for (const source of Array.from(sources).sort()) {
-    output.push(`  - ${source}\n`);
+  // Set iteration follows insertion order, i.e. the relevance order in which
+  // Gemini returned the chunks.
+  return { sources: Array.from(sources), chunks };
+}
+
+function formatAskMarkdown(
+  params: AskQuery,
+  mainResponse: string,
+  parsed: ParsedGrounding,
+  limit: number,
+): string {
+  const CHUNK_CHAR_LIMIT = 500;
+
+  // Appending to one string lets V8 grow a rope and flatten it once, instead
+  // of allocating a list of fragments and joining them at the end.
+  let output =
+    `# Search Results: ${params.reference}\n\n` +
+    `**Query**: ${params.query}\n\n` +
+    `**Response**:\n${mainResponse}\n\n` +
+    "---\n\n" +
+    `**Sources** (${parsed.sources.length} files):\n`;
+  for (const source of parsed.sources) {
+    output += `  - ${source}\n`;
   }
 
   if (params.include_chunks) {
-    output.push("\n---\n\n");
-    output.push("## Retrieved Context Chunks\n\n");
-    for (let i = 0; i < Math.min(params.top_k, chunks.length); i++) {
-      const chunk = chunks[i];
-      if (chunk.retrievedContext) {
-        const ctx = chunk.retrievedContext;
-        const text: string = ctx.text ?? "";
-        const preview =
-          text.length > CHUNK_CHAR_LIMIT
-            ? `${text.slice(0, CHUNK_CHAR_LIMIT)}... [truncated, ${text.length - CHUNK_CHAR_LIMIT} chars omitted]`
-            : text;
-        output.push(`### [${i + 1}] ${ctx.title}\n\n`);
-        output.push(`${preview}\n\n`);
-        output.push("---\n\n");
-      }
+    output += "\n---\n\n## Retrieved Context Chunks\n\n";
+    for (const chunk of parsed.chunks) {
+      const text = chunk.text;
+      const preview =
+        text.length > CHUNK_CHAR_LIMIT
+          ? `${text.slice(0, CHUNK_CHAR_LIMIT)}... [truncated, ${text.length - CHUNK_CHAR_LIMIT} chars omitted]`
+          : text;
+      output += `### [${chunk.index + 1}] ${chunk.title}\n\n${preview}\n\n---\n\n`;
+      // Anything past the limit is sliced off below; stop rendering it.
+      if (output.length > limit) break;
     }
   }
 
-  let result = output.join("");
-  if (result.length > CHARACTER_LIMIT) {
-    const truncated = result.slice(0, CHARACTER_LIMIT);
-    result =
-      truncated +
-      `\n\n[TRUNCATED - Response exceeds ${CHARACTER_LIMIT} characters. Original length: ${result.length}. Try reducing top_k or disabling include_chunks.]`;
+  if (output.length > limit) {
+    const notice =
+      `\n\n[TRUNCATED - Response exceeds ${limit} characters. Try a narrower question or disabling include_sources.]`;
+    return sliceWhole(output, Math.max(0, limit - notice.length)) + notice;
   }
-  return result;
+  return output;
 }
 
 function formatAskJson(
-  params: AskDocsAgentParams,
+  params: AskQuery,
   mainResponse: string,
-  grounding: any,
+  parsed: ParsedGrounding,
+  limit: number,
 ): string {
   const CHUNK_CHAR_LIMIT = 500;
-  const chunks = grounding.groundingChunks || [];
-  const sources = new Set<string>();
   const chunkData: any[] = [];
 
-  for (const chunk of chunks) {
-    if (chunk.retrievedContext?.title) {
-      sources.add(chunk.retrievedContext.title);
-    }
-  }
-
   if (params.include_chunks) {
-    for (let i = 0; i < Math.min(params.top_k, chunks.length); i++) {
-      const chunk = chunks[i];
-      if (chunk.retrievedContext) {
-        const text: string = chunk.retrievedContext.text ?? "";
-        const truncatedText =
-          text.length > CHUNK_CHAR_LIMIT ? text.slice(0, CHUNK_CHAR_LIMIT) : text;
-        chunkData.push({
-          title: chunk.retrievedContext.title,
-          text: truncatedText,
-          truncated: text.length > CHUNK_CHAR_LIMIT,
-          original_length: text.length,
-        });
-      }
+    for (const chunk of parsed.chunks) {
+      const text = chunk.text;
+      chunkData.push({
+        title: chunk.title,
+        text: text.length > CHUNK_CHAR_LIMIT ? text.slice(0, CHUNK_CHAR_LIMIT) : text,
+        truncated: text.length > CHUNK_CHAR_LIMIT,
+        original_length: text.length,
+      });
     }
   }
 
@@ -168,11 +283,89 @@ function formatAskJson(
     query: params.query,
     reference: params.reference,
     response: mainResponse,
-    sources: Array.from(sources).sort(),
+    sources: parsed.sources,
     ...(params.include_chunks && { chunks: chunkData }),
   };
 
-  return JSON.stringify(result, null, 2);
+  const json = JSON.stringify(result, null, JSON_INDENT);
+  if (json.length <= limit) return json;
+
+  // Chunks and sources are bounded, so the answer text is what overflows:
+  // keep the longest prefix whose encoded form fits what the rest of the
+  // payload and the warning leave over.
+  const warning = {
+    message: `Response exceeds ${limit} characters; response text truncated`,
+    original_length: json.length,
+    suggestion: "Ask a narrower question or disable include_sources.",
+  };
+  const encodedResponse = JSON.stringify(mainResponse).length;
+  const warningLength =
+    appendJsonProperty(json, "_truncation_warning", warning).length - json.length;
+  const budget = limit - warningLength - (json.length - encodedResponse);
+  let lo = 0;
+  let hi = Math.min(mainResponse.length, Math.max(0, budget));
+  while (lo < hi) {
+    const mid = (lo + hi + 1) >>> 1;
+    if (JSON.stringify(sliceWhole(mainResponse, mid)).length <= budget) lo = mid;
+    else hi = mid - 1;
+  }
+  const trimmed = JSON.stringify(
+    { ...result, response: sliceWhole(mainResponse, lo) },
+    null,
+    JSON_INDENT,
+  );
+  return appendJsonProperty(trimmed, "_truncation_warning", warning);
+}
+
+/** `text.slice(0, end)`, backing off one unit rather than split a surrogate pair. */
+function sliceWhole(text: string, end: number): string {
+  const code = text.charCodeAt(end - 1);
+  return text.slice(0, code >= 0xd800 && code <= 0xdbff ? end - 1 : end);
+}
+
+/**
+ * Add one property to an already-serialized JSON object by splicing it in
+ * before the closing brace, instead of re-encoding the whole payload.
+ */
+function appendJsonProperty(json: string, key: string, value: unknown): string {
+  const encoded = JSON.stringify(value, null, JSON_INDENT);
+  if (JSON_INDENT === undefined) {
+    return `${json.slice(0, -1)},${JSON.stringify(key)}:${encoded}}`;
+  }
+  // Indented output ends with "\n}"; nest the value one level deeper.
+  const nested = encoded.replace(/\n/g, "\n  ");
+  return `${json.slice(0, -2)},\n  ${JSON.stringify(key)}: ${nested}\n}`;
+}
+
+// Static parts of the no-results reply, built once at load time.
+const NO_RESULTS_SUGGESTION =
+  "The query may not match content in this store. Try rephrasing or use a different store.";
+const NO_RESULTS_HELP =
+  "**Why this happened:** The query may not match any content in this documentation reference.\n\n" +
+  "**Try:**\n" +
+  "  - Rephrasing your question with different keywords\n" +
+  "  - Being more specific or more general\n" +
+  "  - Searching a different documentation reference";
+
+function formatNoResults(params: AskQuery): string {
+  if (params.format === "json") {
+    return JSON.stringify(
+      {
+        query: params.query,
+        reference: params.reference,
+        response: "No results found",
+        sources: [],
+        suggestion: NO_RESULTS_SUGGESTION,
+      },
+      null,
+      JSON_INDENT,
+    );
+  }
+
+  return (
+    `No results found in reference '${params.reference}' for query: ${params.query}\n\n` +
+    NO_RESULTS_HELP
+  );
 }
 
 function handleAskError(error: unknown): string {
@@ -263,64 +456,71 @@ function handleAskError(error: unknown): string {
 export async function askDocsAgent(
   client: GoogleGenAI,
   params: AskDocsAgentParams,
-): Promise<string> {
+): Promise<ToolResult> {
   try {
     const cache = await getStores(client, params.force_refresh === true);
     if (!cache.stores.has(params.reference)) {
       const available = Array.from(cache.stores.keys()).sort();
-      return (
-        `Error: Documentation reference '${params.reference}' not found.\n\n` +
-        `Available references:\n` +
-        available.map((s) => `  - ${s}`).join("\n") +
-        "\n\nNote: References are automatically synced from repository directories. " +
-        "If this directory exists but isn't listed, it may not have been indexed yet. " +
-        "Check your sync workflow status."
-      );
+      return {
+        text:
+          `Error: Documentation reference '${params.reference}' not found.\n\n` +
+          `Available references:\n` +
+          available.map((s) => `  - ${s}`).join("\n") +
+          "\n\nNote: References are automatically synced from repository directories. " +
+          "If this directory exists but isn't listed, it may not have been indexed yet. " +
+          "Check your sync workflow status.",
+        isError: true,
+      };
     }
 
     const storeName = cache.stores.get(params.reference)!;
-    const response = await client.models.generateContent({
-      model: GEMINI_MODEL,
-      contents: params.query,
-      config: {
-        tools: [
-          {
-            fileSearch: {
-              fileSearchStoreNames: [storeName],
-              ...(params.metadata_filter && {
-                metadataFilter: params.metadata_filter,
-              }),
-            },
-          },
-        ],
-        temperature: 0.0,
-      },
-    });
+    if (typeof params.query === "string") {
+      return await answerQuery(
+        client,
+        storeName,
+        { ...params, query: params.query },
+        CHARACTER_LIMIT,
+      );
+    }
 
-    if (!response.candidates || !response.candidates[0]?.groundingMetadata) {
-      if (params.format === "json") {
-        return JSON.stringify(
-          {
-            query: params.query,
-            reference: params.reference,
-            response: "No results found",
-            sources: [],
-            suggestion:
-              "The query may not match content in this store. Try rephrasing or use a different store.",
-          },
-          null,
-          2,
-        );
-      }
+    // Questions against one store are independent, so they run concurrently
+    // on the single store lookup above; answers keep the order asked and
+    // share one response budget.
+    const queries = params.query;
+    const limit = Math.floor(CHARACTER_LIMIT / queries.length) - BATCH_ENTRY_OVERHEAD;
+    const results = await Promise.all(
+      queries.map((query) => answerQuery(client, storeName, { ...params, query }, limit)),
+    );
+    const isError = results.every((r) => r.isError);
+    if (params.format !== "json") {
+      return { text: results.map((r) => r.text).join("\n\n---\n\n"), isError };
+    }
 
-      return (
-        `No results found in reference '${params.reference}' for query: ${params.query}\n\n` +
-        "**Why this happened:** The query may not match any content in this documentation reference.\n\n" +
-        "**Try:**\n" +
-        "  - Rephrasing your question with different keywords\n" +
-        "  - Being more specific or more general\n" +
-        "  - Searching a different documentation reference"
-      );
+    // Each answer is already a capped JSON document (or plain error text);
+    // nest them so the batch is still a single parseable document.
+    const answers = results.map((r, i) =>
+      r.isError ? { query: queries[i], error: r.text } : JSON.parse(r.text),
+    );
+    return {
+      text: JSON.stringify({ reference: params.reference, answers }, null, JSON_INDENT),
+      isError,
+    };
+  } catch (error) {
+    return { text: handleAskError(error), isError: true };
+  }
+}
+
+async function answerQuery(
+  client: GoogleGenAI,
+  storeName: string,
+  params: AskQuery,
+  limit: number,
+): Promise<ToolResult> {
+  try {
+    const response = await generateAnswer(client, storeName, params);
+
+    if (!response.candidates || !response.candidates[0]?.groundingMetadata) {
+      return { text: formatNoResults(params), isError: false };
     }
 
     const grounding = response.candidates[0].groundingMetadata;
@@ -328,11 +528,16 @@ export async function askDocsAgent(
     const parts = response.candidates[0].content?.parts;
     const mainResponse = parts?.map(part => part.text ?? "").join("") || "No response generated";
 
-    if (params.format === "json") {
-      return formatAskJson(params, mainResponse, grounding);
-    }
-    return formatAskMarkdown(params, mainResponse, grounding);
+    const parsed = parseGroundingMetadata(
+      grounding,
+      params.top_k,
+      params.include_chunks,
+    );
+    const text = params.format === "json"
+      ? formatAskJson(params, mainResponse, parsed, limit)
+      : formatAskMarkdown(params, mainResponse, parsed, limit);
+    return { text, isError: false };
   } catch (error) {
-    return handleAskError(error);
+    return { text: handleAskError(error), isError: true };
   }
 }
@@ -1,19 +1,47 @@
+import https from "node:https";
+
 import axios, { AxiosError } from "axios";
 
+import { TtlCache, cachedLoad } from "../cache.js";
+import type { ToolResult } from "../types.js";
+
 const CONTEXT7_API_URL = "https://context7.com/api/v1";
 const CONTEXT7_API_KEY = process.env.CONTEXT7_API_KEY;
+const CONTEXT7_TIMEOUT_MS = Number(process.env.CONTEXT7_TIMEOUT_MS ?? 30_000);
+const CONTEXT7_DISABLE_HTTP2 = process.env.CONTEXT7_DISABLE_HTTP2 === "1";
+const CONTEXT7_CACHE_TTL_MS = Number(
+  process.env.CONTEXT7_CACHE_TTL_MS ?? 300_000,
+);
+// Idle time before the shared HTTP/2 session to Context7 is closed.
+const CONTEXT7_HTTP2_SESSION_TIMEOUT_MS = 300_000;
+const CONTEXT7_CACHE_SIZE = 128;
+const RESPONSE_CACHE_SIZE = 256;
+// Targets of one batched call fetched at the same time; keeps a large batch
+// from tripping Context7's rate limit.
+const BATCH_CONCURRENCY = 4;
 const CHARACTER_LIMIT = 25_000;
+// Room kept back from each batched target's share of CHARACTER_LIMIT for its
+// heading (targets run to 200 characters) and truncation notice.
+const BATCH_ENTRY_OVERHEAD = 512;
 
-const DEPTH_TOKENS = {
+const DEPTH_TOKENS = Object.freeze({
   low: Number(process.env.FETCH_DOCS_LOW_TOKENS ?? "5000"),
   medium: Number(process.env.FETCH_DOCS_MEDIUM_TOKENS ?? "15000"),
   high: Number(process.env.FETCH_DOCS_HIGH_TOKENS ?? "50000"),
-} as const;
+});
 
 const SEMANTIC_FLOOR = Number(
   process.env.FETCH_DOCS_SEMANTIC_FLOOR ?? "60",
 );
 
+// Share of the gap to a perfect score granted, for ranking only, to
+// libraries whose title or repo contains the target. SEMANTIC_FLOOR is
+// always checked against the plain edit-distance ratio.
+const CONTAINMENT_WEIGHT = 0.25;
+
+// Fuzzy-match suggestions kept and shown when a target has no good match.
+const MAX_CANDIDATES = 5;
+
 type Depth = keyof typeof DEPTH_TOKENS;
 
 enum ResponseFormat {
@@ -22,110 +50,173 @@ enum ResponseFormat {
 }
 
 export interface FetchDocsParams {
-  target: string;
+  target: string | string[];
   tag?: string;
   depth: Depth;
   version?: string;
   browse_index: boolean;
+  refresh: boolean;
 }
 
 interface FetchParams {
-  target: string;
-  tag?: string;
-  depth: Depth;
-  version?: string;
-  browseIndex: boolean;
-  responseFormat: ResponseFormat;
+  readonly target: string;
+  /** Lowercased, trimmed `target`, the form every match lookup keys on. */
+  readonly normalizedTarget: string;
+  readonly tag?: string;
+  readonly depth: Depth;
+  /** Token budget for `depth`, resolved once when the params are built. */
+  readonly tokens: number;
+  readonly version?: string;
+  readonly browseIndex: boolean;
+  readonly responseFormat: ResponseFormat;
+  /** Characters this target's docs may use; a batch splits CHARACTER_LIMIT. */
+  readonly charLimit: number;
 }
 
 interface LibraryInfo {
-  id: string;
-  title: string;
-  description: string;
-  stars: number;
-  totalTokens: number;
-  trustScore: number;
-  benchmarkScore: number;
-  versions: string[];
-  branch: string;
-  state: string;
+  readonly id: string;
+  readonly title: string;
+  readonly description: string;
+  readonly stars: number;
+  readonly totalTokens: number;
+  readonly trustScore: number;
+  readonly benchmarkScore: number;
+  readonly versions: readonly string[];
+  readonly branch: string;
+  readonly state: string;
 }
 
 interface DocumentChunk {
-  title: string;
-  content: string;
-  source: string;
-  url: string;
+  readonly title: string;
+  readonly content: string;
+  readonly source: string;
+  readonly url: string;
 }
 
 interface DocumentationResult {
-  libraryId: string;
-  version: string;
-  topic: string | null;
-  tokens: number;
-  chunks: DocumentChunk[];
+  readonly libraryId: string;
+  readonly version: string;
+  readonly topic: string | null;
+  readonly tokens: number;
+  readonly chunks: readonly DocumentChunk[];
 }
 
 interface MatchResult {
-  library: LibraryInfo | null;
-  score: number;
-  tier: string;
-  candidates: Array<{ lib: LibraryInfo; score: number }>;
+  readonly library: LibraryInfo | null;
+  readonly score: number;
+  readonly tier: string;
+  readonly candidates: ReadonlyArray<{ readonly lib: LibraryInfo; readonly score: number }>;
+}
+
+interface ScoredChoice {
+  readonly lib: LibraryInfo;
+  /** Best Levenshtein ratio (0-100) over the library's names. */
+  readonly score: number;
+  /** `score` plus the containment bonus; orders choices, never gates them. */
+  readonly rank: number;
+}
+
+// Shared client so repeated calls reuse pooled keep-alive connections to
+// Context7 instead of paying a TCP + TLS handshake per request. HTTP/2 lets
+// concurrent lookups (e.g. a batch's targets) share one session, which is
+// kept open between tool calls rather than axios' one-second default. The
+// keep-alive agent is only used with CONTEXT7_DISABLE_HTTP2=1; nothing falls
+// back to HTTP/1.1 on its own, so if HTTP/2 cannot be negotiated every call
+// fails until that is set.
+const context7Http = axios.create({
+  baseURL: CONTEXT7_API_URL,
+  timeout: CONTEXT7_TIMEOUT_MS,
+  httpVersion: CONTEXT7_DISABLE_HTTP2 ? 1 : 2,
+  http2Options: { sessionTimeout: CONTEXT7_HTTP2_SESSION_TIMEOUT_MS },
+  headers: CONTEXT7_API_KEY
+    ? { Authorization: `Bearer ${CONTEXT7_API_KEY}` }
+    : {},
+  httpsAgent: new https.Agent({
+    keepAlive: true,
+    maxSockets: 20,
+    maxFreeSockets: 10,
+  }),
+});
+
+// Context7 content changes slowly, so identical lookups within the TTL are
+// served from memory; `refresh: true` clears them all.
+const searchCache = new TtlCache<Promise<LibraryInfo[]>>(
+  CONTEXT7_CACHE_SIZE,
+  CONTEXT7_CACHE_TTL_MS,
+);
+const docsCache = new TtlCache<Promise<DocumentationResult>>(
+  CONTEXT7_CACHE_SIZE,
+  CONTEXT7_CACHE_TTL_MS,
+);
+
+// Finished tool output per request, so a repeated call skips matching and
+// formatting as well as the network. Only non-error responses are stored.
+const responseCache = new TtlCache<string>(
+  RESPONSE_CACHE_SIZE,
+  CONTEXT7_CACHE_TTL_MS,
+);
+
+/**
+ * Evict every cached Context7 response and the tool output rendered from
+ * them, for `refresh: true`.
+ */
+function invalidateContext7Cache(): void {
+  searchCache.clear();
+  docsCache.clear();
+  responseCache.clear();
 }
 
 async function makeRequest<T>(
-  url: string,
+  path: string,
   options?: {
     method?: "GET" | "POST";
     params?: Record<string, unknown>;
     timeout?: number;
-    headers?: Record<string, string>;
   },
 ): Promise<T> {
-  const response = await axios.request<T>({
-    url,
+  const response = await context7Http.request<T>({
+    url: path,
     method: options?.method ?? "GET",
     params: options?.params,
     timeout: options?.timeout,
-    headers: options?.headers,
   });
   return response.data;
 }
 
 function truncateResponse(content: string, limit: number = CHARACTER_LIMIT): string {
   if (content.length <= limit) return content;
-  const truncated = content.slice(0, limit);
+  // Back off one unit rather than leave half of a surrogate pair, which
+  // would not survive UTF-8 encoding on the way out.
+  const code = content.charCodeAt(limit - 1);
+  const end = code >= 0xd800 && code <= 0xdbff ? limit - 1 : limit;
+  const truncated = content.slice(0, end);
   return (
     `${truncated}\n\n[TRUNCATED - Response exceeds ${limit.toLocaleString()} characters. ` +
     `Try using a lower depth or adding a topic filter.]`
   );
 }
 
-function formatApiErrorMessage(statusCode: number, message: string): string {
-  const suggestions: string[] = [];
-  if (statusCode === 401) {
-    suggestions.push("Check your CONTEXT7_API_KEY if using authentication");
-  } else if (statusCode === 404) {
-    suggestions.push("The library may not exist in Context7's index");
-    suggestions.push("Try searching with unsure=true to see available libraries");
-  } else if (statusCode === 429) {
-    suggestions.push("You've hit the rate limit - wait a moment and try again");
-    suggestions.push("Set CONTEXT7_API_KEY for higher rate limits");
-  }
-  if (!suggestions.length) {
-    suggestions.push("Try again later");
-  }
+// Rendered suggestion bullets per Context7 status code.
+const API_ERROR_SUGGESTIONS: Readonly<Record<number, string>> = {
+  401: "- Check your CONTEXT7_API_KEY if using authentication\n",
+  404:
+    "- The library may not exist in Context7's index\n" +
+    "- Try searching with unsure=true to see available libraries\n",
+  429:
+    "- You've hit the rate limit - wait a moment and try again\n" +
+    "- Set CONTEXT7_API_KEY for higher rate limits\n",
+};
+const API_ERROR_DEFAULT_SUGGESTION = "- Try again later\n";
 
-  return [
-    "# API Error",
-    "",
-    `**Status:** ${statusCode}`,
-    `**Message:** ${message}`,
-    "",
-    "**Suggestions:**",
-    ...suggestions.map((s) => `- ${s}`),
-    "",
-  ].join("\n");
+function formatApiErrorMessage(statusCode: number, message: string): string {
+  const suggestions = API_ERROR_SUGGESTIONS[statusCode] ?? API_ERROR_DEFAULT_SUGGESTION;
+  return (
+    "# API Error\n\n" +
+    `**Status:** ${statusCode}\n` +
+    `**Message:** ${message}\n\n` +
+    "**Suggestions:**\n" +
+    suggestions
+  );
 }
 
 function formatError(error: unknown, context: string): string {
@@ -143,16 +234,16 @@ function formatError(error: unknown, context: string): string {
   return `Error in ${context}: ${message}`;
 }
 
-async function searchLibraries(query: string): Promise<LibraryInfo[]> {
-  const headers: Record<string, string> = {};
-  if (CONTEXT7_API_KEY) {
-    headers["Authorization"] = `Bearer ${CONTEXT7_API_KEY}`;
-  }
+function searchLibraries(query: string): Promise<LibraryInfo[]> {
+  return cachedLoad(searchCache, `search:${query}`, () =>
+    requestLibraries(query),
+  );
+}
 
+async function requestLibraries(query: string): Promise<LibraryInfo[]> {
   type SearchResponse = { results?: any[] };
-  const data = await makeRequest<SearchResponse>(`${CONTEXT7_API_URL}/search`, {
+  const data = await makeRequest<SearchResponse>("/search", {
     params: { query },
-    headers,
   });
 
   const results = data.results ?? [];
@@ -170,21 +261,26 @@ async function searchLibraries(query: string): Promise<LibraryInfo[]> {
   }));
 }
 
-async function getDocumentation(
+function getDocumentation(
   libraryId: string,
   topic: string | undefined,
   tokens: number,
   version: string | undefined,
 ): Promise<DocumentationResult> {
   const cleanId = libraryId.replace(/^\/+/, "");
-  const base = version
-    ? `${CONTEXT7_API_URL}/${cleanId}/${version}`
-    : `${CONTEXT7_API_URL}/${cleanId}`;
+  const key = `docs:${cleanId}\n${version ?? ""}\n${topic ?? ""}\n${tokens}`;
+  return cachedLoad(docsCache, key, () =>
+    requestDocumentation(cleanId, topic, tokens, version),
+  );
+}
 
-  const headers: Record<string, string> = {};
-  if (CONTEXT7_API_KEY) {
-    headers["Authorization"] = `Bearer ${CONTEXT7_API_KEY}`;
-  }
+async function requestDocumentation(
+  cleanId: string,
+  topic: string | undefined,
+  tokens: number,
+  version: string | undefined,
+): Promise<DocumentationResult> {
+  const base = version ? `/${cleanId}/${version}` : `/${cleanId}`;
 
   const params: Record<string, unknown> = {
     type: "json",
@@ -209,30 +305,31 @@ async function getDocumentation(
     snippets?: Snippet[];
   };
 
-  const data = await makeRequest<DocsResponse>(base, { params, headers });
+  const data = await makeRequest<DocsResponse>(base, { params });
   const snippets = data.snippets ?? [];
 
   const chunks: DocumentChunk[] = snippets.map((snippet) => {
-    const parts: string[] = [];
-    if (snippet.codeDescription) parts.push(snippet.codeDescription);
-    if (snippet.codeList && snippet.codeList.length) {
+    // Append straight into one string rather than collecting parts to join;
+    // separators go between parts exactly as "\n\n".join would place them.
+    const description = snippet.codeDescription;
+    let content = description || "";
+    let hasParts = !!description;
+    const codeList = snippet.codeList;
+    if (codeList && codeList.length) {
       const lang = snippet.codeLanguage ?? "";
-      for (const code of snippet.codeList) {
-        if (lang) {
-          parts.push(`\n\n\`\`\`${lang}\n${code}\n\`\`\``);
-        } else {
-          parts.push(code);
-        }
+      const fence = `\n\n\`\`\`${lang}\n`;
+      for (const code of codeList) {
+        if (hasParts) content += "\n\n";
+        content += lang ? `${fence}${code}\n\`\`\`` : code;
+        hasParts = true;
       }
     }
-    const title = snippet.codeTitle || snippet.pageTitle || "";
     const source = snippet.pageTitle || "";
-    const url = snippet.codeId || "";
     return {
-      title,
-      content: parts.join("\n\n"),
+      title: snippet.codeTitle || source,
+      content,
       source,
-      url,
+      url: snippet.codeId || "",
     };
   });
 
@@ -250,153 +347,280 @@ async function getDocumentation(
   };
 }
 
-function buildMatchResult(libraries: LibraryInfo[], target: string): MatchResult {
-  if (!libraries.length) {
-    return { library: null, score: 0, tier: "none", candidates: [] };
-  }
-
-  const normalizedTarget = target.toLowerCase().trim();
-  const normalizedTargetNoSlash = normalizedTarget.replace(/^\/+/, "");
+interface MatchIndex {
+  /**
+   * Every exact-match alias (lowercase title, repo, id, id without leading
+   * slash, and dotless title/repo such as "nextjs") mapped to its library.
+   * When aliases collide the higher tier wins, in that order.
+   */
+  aliases: Map<string, LibraryInfo>;
+  /**
+   * Distinct lowercase names per library, scored by the semantic tier, and
+   * the library's title and repo joined by a newline for substring scans.
+   */
+  choices: Array<{ lib: LibraryInfo; names: string[]; haystack: string }>;
+  /** Match results already computed against this index, by normalized target. */
+  results: Map<string, MatchResult>;
+}
 
-  const byTitle = new Map<string, LibraryInfo>();
-  const byRepo = new Map<string, LibraryInfo>();
-  const byId = new Map<string, LibraryInfo>();
-  const byIdNoSlash = new Map<string, LibraryInfo>();
+// One index per search-result array. searchLibraries hands back the same
+// cached array for repeat queries, so the lookup tables, fuzzy choices and
+// earlier match results are reused, and all of it is collected together with
+// the array once the cache drops it.
+const matchIndexes = new WeakMap<LibraryInfo[], MatchIndex>();
+
+function getMatchIndex(libraries: LibraryInfo[]): MatchIndex {
+  let index = matchIndexes.get(libraries);
+  if (index) return index;
+
+  // Alias tiers from lowest to highest precedence. They are written into
+  // one map in that order so a higher tier overwrites a lower one, and
+  // within a tier the later library wins, as with one map per tier.
+  const tiers: Array<Array<[string, LibraryInfo]>> = [[], [], [], [], []];
+  const choices: MatchIndex["choices"] = [];
   for (const lib of libraries) {
-    byTitle.set(lib.title.toLowerCase(), lib);
-    const repo = lib.id.includes("/")
-      ? lib.id.split("/").pop()!.toLowerCase()
-      : lib.id.toLowerCase();
-    byRepo.set(repo, lib);
-    byId.set(lib.id.toLowerCase(), lib);
-    byIdNoSlash.set(lib.id.toLowerCase().replace(/^\/+/, ""), lib);
+    const title = lib.title.toLowerCase();
+    const id = lib.id.toLowerCase();
+    const repo = id.slice(id.lastIndexOf("/") + 1);
+    if (repo.includes(".")) tiers[0].push([repo.replaceAll(".", ""), lib]);
+    if (title.includes(".")) tiers[0].push([title.replaceAll(".", ""), lib]);
+    tiers[1].push([id.replace(/^\/+/, ""), lib]);
+    tiers[2].push([id, lib]);
+    tiers[3].push([repo, lib]);
+    tiers[4].push([title, lib]);
+    choices.push({
+      lib,
+      names: Array.from(new Set([title, repo, id])),
+      haystack: `${title}\n${repo}`,
+    });
   }
 
-  if (byTitle.has(normalizedTarget)) {
-    return {
-      library: byTitle.get(normalizedTarget)!,
-      score: 100,
-      tier: "exact",
-      candidates: [],
-    };
-  }
-  if (byRepo.has(normalizedTarget)) {
-    return {
-      library: byRepo.get(normalizedTarget)!,
-      score: 100,
-      tier: "exact",
-      candidates: [],
-    };
-  }
+  index = { aliases: new Map(tiers.flat()), choices, results: new Map() };
+  matchIndexes.set(libraries, index);
+  return index;
+}
 
-  if (byId.has(normalizedTarget)) {
-    return {
-      library: byId.get(normalizedTarget)!,
-      score: 100,
-      tier: "exact",
-      candidates: [],
-    };
+/** `normalizedTarget` must already be lowercased and trimmed. */
+function findBestMatch(
+  libraries: LibraryInfo[],
+  normalizedTarget: string,
+): MatchResult {
+  const index = getMatchIndex(libraries);
+  let result = index.results.get(normalizedTarget);
+  if (!result) {
+    result = buildMatchResult(libraries, index, normalizedTarget);
+    index.results.set(normalizedTarget, result);
   }
+  return result;
+}
 
-  if (byIdNoSlash.has(normalizedTargetNoSlash)) {
-    return {
-      library: byIdNoSlash.get(normalizedTargetNoSlash)!,
-      score: 100,
-      tier: "exact",
-      candidates: [],
+/**
+ * Levenshtein distance from a fixed pattern to any text, set up once per
+ * pattern. Patterns of up to 32 UTF-16 units use Myers' bit-parallel
+ * algorithm (Hyyrö's formulation): one column of the DP is packed into the
+ * bits of an int, so each text character costs a handful of word operations.
+ * Longer patterns fall back to a two-row DP whose rows are reused per call.
+ */
+function levenshteinFrom(pattern: string): (text: string) => number {
+  const m = pattern.length;
+  if (m === 0) return (text) => text.length;
+
+  if (m <= 32) {
+    const peq = new Map<number, number>();
+    for (let i = 0; i < m; i++) {
+      const c = pattern.charCodeAt(i);
+      peq.set(c, (peq.get(c) ?? 0) | (1 << i));
+    }
+    const last = 1 << (m - 1);
+    return (text) => {
+      let pv = -1;
+      let mv = 0;
+      let dist = m;
+      for (let i = 0; i < text.length; i++) {
+        const eq = peq.get(text.charCodeAt(i)) ?? 0;
+        const xv = eq | mv;
+        // The add can carry past bit 31; `^` truncates it back to 32 bits.
+        const xh = (((eq & pv) + pv) ^ pv) | eq;
+        let ph = mv | ~(xh | pv);
+        let mh = pv & xh;
+        if (ph & last) dist++;
+        else if (mh & last) dist--;
+        ph = (ph << 1) | 1;
+        mh <<= 1;
+        pv = mh | ~(xv | ph);
+        mv = ph & xv;
+      }
+      return dist;
     };
   }
 
-  function similarity(a: string, b: string): number {
-    const la = a.length;
-    const lb = b.length;
-    const dp: number[][] = Array.from({ length: la + 1 }, () =>
-      new Array(lb + 1).fill(0),
-    );
-    for (let i = 0; i <= la; i++) dp[i][0] = i;
-    for (let j = 0; j <= lb; j++) dp[0][j] = j;
-    for (let i = 1; i <= la; i++) {
-      for (let j = 1; j <= lb; j++) {
-        const cost = a[i - 1] === b[j - 1] ? 0 : 1;
-        dp[i][j] = Math.min(
-          dp[i - 1][j] + 1,
-          dp[i][j - 1] + 1,
-          dp[i - 1][j - 1] + cost,
-        );
+  const codes = new Int32Array(m);
+  for (let j = 0; j < m; j++) codes[j] = pattern.charCodeAt(j);
+  let prev = new Int32Array(m + 1);
+  let curr = new Int32Array(m + 1);
+  return (text) => {
+    for (let j = 0; j <= m; j++) prev[j] = j;
+    for (let i = 1; i <= text.length; i++) {
+      curr[0] = i;
+      const c = text.charCodeAt(i - 1);
+      for (let j = 1; j <= m; j++) {
+        const cost = codes[j - 1] === c ? 0 : 1;
+        curr[j] = Math.min(prev[j] + 1, curr[j - 1] + 1, prev[j - 1] + cost);
       }
+      const tmp = prev;
+      prev = curr;
+      curr = tmp;
     }
-    const dist = dp[la][lb];
-    const maxLen = Math.max(la, lb) || 1;
-    return 100 * (1 - dist / maxLen);
-  }
+    return prev[m];
+  };
+}
 
-  const candidates: Array<{ lib: LibraryInfo; score: number }> = [];
-  for (const lib of libraries) {
-    const names = new Set<string>();
-    names.add(lib.title.toLowerCase());
-    const repo = lib.id.includes("/")
-      ? lib.id.split("/").pop()!.toLowerCase()
-      : lib.id.toLowerCase();
-    names.add(repo);
-    names.add(lib.id.toLowerCase());
+/**
+ * Score and rank every library against one target, in a single pass.
+ * The score is the best Levenshtein ratio over the library's names. Libraries
+ * whose title or repo contains the target rank CONTAINMENT_WEIGHT of the gap
+ * to 100 higher, so substring hits sort above near-misses without hiding the
+ * rest or lowering the floor. The distance function is prepared once for the
+ * whole batch, and a name is only scored when its length-difference bound
+ * (the distance is at least the length difference) could beat the library's
+ * best so far.
+ */
+function scoreChoices(
+  target: string,
+  choices: MatchIndex["choices"],
+): ScoredChoice[] {
+  const lt = target.length;
+  const distance = levenshteinFrom(target);
 
+  const scores: ScoredChoice[] = [];
+  for (const { lib, names, haystack } of choices) {
     let bestForLib = 0;
     for (const name of names) {
-      const score = similarity(normalizedTarget, name);
+      const maxLen = Math.max(lt, name.length) || 1;
+      if (100 * (1 - Math.abs(lt - name.length) / maxLen) <= bestForLib) continue;
+
+      const score = 100 * (1 - distance(name) / maxLen);
       if (score > bestForLib) bestForLib = score;
     }
-    candidates.push({ lib, score: bestForLib });
+    const rank = containsTarget(haystack, target)
+      ? bestForLib + (100 - bestForLib) * CONTAINMENT_WEIGHT
+      : bestForLib;
+    scores.push({ lib, score: bestForLib, rank });
+  }
+  return scores;
+}
+
+/**
+ * Whether a choice's title or repo contains `target`. One- or two-character
+ * targets must be a prefix instead, since containing them says little. The
+ * owner part of the id is left out so "/tailwindcss/jest" does not claim
+ * "tailwindcss".
+ */
+function containsTarget(haystack: string, target: string): boolean {
+  return target.length <= 2
+    ? haystack.startsWith(target) || haystack.includes(`\n${target}`)
+    : haystack.includes(target);
+}
+
+/**
+ * The `k` highest-ranked entries, best first, in O(n * k) instead of a full
+ * sort. Ties keep their input order, as the stable sort this replaces did.
+ */
+function topCandidates(scored: ScoredChoice[], k: number): ScoredChoice[] {
+  const top: ScoredChoice[] = [];
+  for (const entry of scored) {
+    if (top.length === k && entry.rank <= top[k - 1].rank) continue;
+    let i = top.length;
+    while (i > 0 && top[i - 1].rank < entry.rank) i--;
+    top.splice(i, 0, entry);
+    if (top.length > k) top.pop();
   }
+  return top;
+}
 
-  candidates.sort((a, b) => b.score - a.score);
-  const best = candidates[0];
-  if (best.score >= SEMANTIC_FLOOR) {
+function buildMatchResult(
+  libraries: LibraryInfo[],
+  index: MatchIndex,
+  normalizedTarget: string,
+): MatchResult {
+  if (!libraries.length) {
+    return { library: null, score: 0, tier: "none", candidates: [] };
+  }
+
+  const exact =
+    index.aliases.get(normalizedTarget) ??
+    index.aliases.get(normalizedTarget.replace(/^\/+/, ""));
+  if (exact) {
+    return { library: exact, score: 100, tier: "exact", candidates: [] };
+  }
+
+  const scored = scoreChoices(normalizedTarget, index.choices);
+  // Only libraries that clear the floor on their own ratio can match; the
+  // containment bonus then picks between them.
+  let best: ScoredChoice | undefined;
+  let bestScore = 0;
+  for (const entry of scored) {
+    if (entry.score > bestScore) bestScore = entry.score;
+    if (entry.score >= SEMANTIC_FLOOR && (!best || entry.rank > best.rank)) {
+      best = entry;
+    }
+  }
+  if (best) {
     return {
       library: best.lib,
       score: best.score,
       tier: "semantic",
-      candidates,
+      candidates: [],
     };
   }
 
+  // Suggestions are only shown when nothing matched, so rank them lazily.
+  // Search can list the same id more than once; suggest each id once, at
+  // its best rank.
+  const byId = new Map<string, ScoredChoice>();
+  for (const entry of scored) {
+    const seen = byId.get(entry.lib.id);
+    if (!seen || entry.rank > seen.rank) byId.set(entry.lib.id, entry);
+  }
   return {
     library: null,
-    score: best.score,
+    score: bestScore,
     tier: "semantic",
-    candidates,
+    candidates: topCandidates(Array.from(byId.values()), MAX_CANDIDATES),
   };
 }
 
+// The markdown formatters append to a single string, which V8 grows as a
+// rope and flattens once, rather than pushing fragments and joining them.
 function formatDocsMarkdown(result: DocumentationResult, params: FetchParams): string {
-  const out: string[] = [];
   const libName = result.libraryId.includes("/")
     ? result.libraryId.split("/").pop()!
     : result.libraryId;
 
-  out.push(`# Documentation: ${libName}\n`);
-  out.push(`**Library:** ${result.libraryId}`);
-  out.push(`**Version:** ${result.version}`);
-  if (result.topic) {
-    out.push(`**Topic:** ${result.topic}`);
-  }
-  out.push(
-    `**Tokens:** ${result.tokens.toLocaleString()} / ${DEPTH_TOKENS[params.depth].toLocaleString()} requested`,
-  );
-  out.push("\n---\n\n");
+  const topic = result.topic ? `**Topic:** ${result.topic}\n` : "";
+  let out =
+    `# Documentation: ${libName}\n\n` +
+    `**Library:** ${result.libraryId}\n` +
+    `**Version:** ${result.version}\n` +
+    topic +
+    `**Tokens:** ${result.tokens.toLocaleString()} / ${params.tokens.toLocaleString()} requested\n` +
+    "\n---\n\n";
 
   for (const chunk of result.chunks) {
     if (chunk.title) {
-      out.push(`## ${chunk.title}\n\n`);
+      out += `## ${chunk.title}\n\n`;
     }
-    out.push(`${chunk.content}\n\n`);
+    out += `${chunk.content}\n\n`;
     if (chunk.url) {
       const sourceText = chunk.source || "Source";
-      out.push(`[${sourceText}](${chunk.url})\n\n`);
+      out += `[${sourceText}](${chunk.url})\n\n`;
     }
-    out.push("---\n\n");
+    out += "---\n\n";
+    // Everything past the limit is cut by fetchDocsForTarget anyway.
+    if (out.length > params.charLimit) break;
   }
 
-  return truncateResponse(out.join(""));
+  return out;
 }
 
 function formatDocsJson(result: DocumentationResult, params: FetchParams): string {
@@ -405,48 +629,67 @@ function formatDocsJson(result: DocumentationResult, params: FetchParams): strin
     version: result.version,
     topic: result.topic,
     tokens_used: result.tokens,
-    tokens_requested: DEPTH_TOKENS[params.depth],
-    chunks: result.chunks.map((chunk) => ({
-      title: chunk.title,
-      content: chunk.content,
-      source: chunk.source,
-      url: chunk.url,
-    })),
+    tokens_requested: params.tokens,
+    // Chunks already have exactly the output fields, in output order.
+    chunks: result.chunks,
   };
   return JSON.stringify(data, null, 2);
 }
 
 function formatSearchMarkdown(libraries: LibraryInfo[], query: string): string {
-  const out: string[] = [];
-  out.push("# Library Search Results\n\n");
-  out.push(`**Query:** "${query}"\n\n`);
-  out.push(`Found ${libraries.length} matching libraries:\n\n`);
-  out.push("| Library | Stars | Quality | Tokens | Description |\n");
-  out.push("|---------|-------|---------|--------|-------------|\n");
-
-  const top = libraries.slice(0, 15);
-  for (const lib of top) {
-    const stars = formatNumber(lib.stars);
-    const quality = lib.benchmarkScore ? lib.benchmarkScore.toFixed(1) : "N/A";
-    const tokens = formatNumber(lib.totalTokens);
-    const desc = lib.description.length > 50
-      ? `${lib.description.slice(0, 50)}...`
-      : lib.description;
-    out.push(
-      `| ${lib.id} | ${stars} | ${quality} | ${tokens} | ${desc} |\n`,
-    );
+  let out =
+    "# Library Search Results\n\n" +
+    `**Query:** "${query}"\n\n` +
+    `Found ${libraries.length} matching libraries:\n\n` +
+    "| Library | Stars | Quality | Tokens | Description |\n" +
+    "|---------|-------|---------|--------|-------------|\n";
+
+  const end = Math.min(libraries.length, 15);
+  for (let i = 0; i < end; i++) {
+    out += formatSearchRow(libraries[i]);
   }
 
   if (libraries.length > 15) {
-    out.push(`\n*...and ${libraries.length - 15} more results*\n`);
+    out += `\n*...and ${libraries.length - 15} more results*\n`;
   }
 
   const firstId = libraries[0]?.id ?? "/owner/repo";
-  out.push(
-    `\n**To fetch:** Use \`fetch_docs(target="${firstId}")\`\n`,
-  );
+  out += `\n**To fetch:** Use \`fetch_docs(target="${firstId}")\`\n`;
 
-  return out.join("");
+  return out;
+}
+
+// Rendered table rows per library object. Search results are cached and
+// shared, so browsing the same query again reuses the rows already built.
+const searchRows = new WeakMap<LibraryInfo, string>();
+
+function formatSearchRow(lib: LibraryInfo): string {
+  let row = searchRows.get(lib);
+  if (row === undefined) {
+    row = renderSearchRow(lib);
+    searchRows.set(lib, row);
+  }
+  return row;
+}
+
+// Characters that would break a markdown table cell, and their replacements.
+const TABLE_CELL_ESCAPES: Readonly<Record<string, string>> = {
+  "|": "\\|",
+  "\r": " ",
+  "\n": " ",
+};
+const TABLE_CELL_UNSAFE = /[|\r\n]/g;
+
+function escapeTableCell(text: string): string {
+  return text.replace(TABLE_CELL_UNSAFE, (ch) => TABLE_CELL_ESCAPES[ch]);
+}
+
+function renderSearchRow(lib: LibraryInfo): string {
+  const quality = lib.benchmarkScore ? lib.benchmarkScore.toFixed(1) : "N/A";
+  const desc = lib.description.length > 50
+    ? `${escapeTableCell(lib.description.slice(0, 50))}...`
+    : escapeTableCell(lib.description);
+  return `| ${lib.id} | ${formatNumber(lib.stars)} | ${quality} | ${formatNumber(lib.totalTokens)} | ${desc} |\n`;
 }
 
 function formatSearchJson(libraries: LibraryInfo[], query: string): string {
@@ -466,130 +709,189 @@ function formatSearchJson(libraries: LibraryInfo[], query: string): string {
   return JSON.stringify(data, null, 2);
 }
 
+const NO_RESULTS_SUGGESTION = "Try a different search term or check spelling";
+const NO_RESULTS_HELP =
+  "No libraries found matching this search term.\n\n" +
+  "**Suggestions:**\n" +
+  "- Check the spelling of the library name\n" +
+  "- Try the official name (e.g., \"Next.js\" instead of \"nextjs\")\n";
+
 function formatNoResults(target: string, responseFormat: ResponseFormat): string {
   if (responseFormat === ResponseFormat.JSON) {
-    return JSON.stringify(
-      {
-        error: "no_results",
-        target,
-        message: `No libraries found matching '${target}'`,
-        suggestion:
-          "Try a different search term or check spelling",
-      },
-      null,
-      2,
-    );
+    // Error payloads are read by the client, not people; keep them compact.
+    return JSON.stringify({
+      error: "no_results",
+      target,
+      message: `No libraries found matching '${target}'`,
+      suggestion: NO_RESULTS_SUGGESTION,
+    });
   }
 
-  return [
-    "# No Results Found",
-    "",
-    `**Target:** "${target}"`,
-    "",
-    "No libraries found matching this search term.",
-    "",
-    "**Suggestions:**",
-    "- Check the spelling of the library name",
-    "- Try the official name (e.g., \"Next.js\" instead of \"nextjs\")",
-    `- Use \`fetch_docs(target="${target}", browse_index=true)\` to see partial matches`,
-    "",
-  ].join("\n");
+  return (
+    `# No Results Found\n\n**Target:** "${target}"\n\n` +
+    NO_RESULTS_HELP +
+    `- Use \`fetch_docs(target="${target}", browse_index=true)\` to see partial matches\n`
+  );
 }
 
 function formatNoMatch(
   target: string,
-  candidates: Array<{ lib: LibraryInfo; score: number }>,
+  candidates: MatchResult["candidates"],
   responseFormat: ResponseFormat,
 ): string {
   if (responseFormat === ResponseFormat.JSON) {
-    return JSON.stringify(
-      {
-        error: "no_confident_match",
-        target,
-        message: "No library found with sufficient confidence",
-        candidates: candidates.slice(0, 5).map(({ lib, score }) => ({
-          id: lib.id,
-          title: lib.title,
-          score,
-        })),
-        suggestion:
-          `Try fetch_docs(target="${target}", browse_index=true) to see all results`,
-      },
-      null,
-      2,
-    );
+    return JSON.stringify({
+      error: "no_confident_match",
+      target,
+      message: "No library found with sufficient confidence",
+      candidates: candidates.slice(0, MAX_CANDIDATES).map(({ lib, score }) => ({
+        id: lib.id,
+        title: lib.title,
+        score,
+      })),
+      suggestion:
+        `Try fetch_docs(target="${target}", browse_index=true) to see all results`,
+    });
   }
 
-  const out: string[] = [];
-  out.push("# No Match Found\n\n");
-  out.push(`**Target:** "${target}"\n\n`);
-  out.push("No library found with sufficient confidence.\n\n");
+  let out =
+    "# No Match Found\n\n" +
+    `**Target:** "${target}"\n\n` +
+    "No library found with sufficient confidence.\n\n";
   if (candidates.length) {
-    out.push("**Did you mean?**\n");
-    for (const { lib, score } of candidates.slice(0, 5)) {
-      out.push(`  - ${lib.id} (score: ${score.toFixed(1)})\n`);
+    out += "**Did you mean?**\n";
+    for (const { lib, score } of candidates.slice(0, MAX_CANDIDATES)) {
+      out += `  - ${lib.id} (score: ${score.toFixed(1)})\n`;
     }
-    out.push("\n");
+    out += "\n";
   }
-  out.push(
-    `**Tip:** Try \`fetch_docs(target="${target}", browse_index=true)\` to see all search results.\n`,
-  );
-  return out.join("");
+  out +=
+    `**Tip:** Try \`fetch_docs(target="${target}", browse_index=true)\` to see all search results.\n`;
+  return out;
 }
 
+// Largest unit first; formatNumber takes the first threshold n reaches.
+const NUMBER_UNITS: ReadonlyArray<readonly [number, string]> = [
+  [1_000_000, "M"],
+  [1_000, "k"],
+];
+
 function formatNumber(n: number): string {
-  if (n >= 1_000_000) return `${(n / 1_000_000).toFixed(1)}M`;
-  if (n >= 1_000) return `${(n / 1_000).toFixed(1)}k`;
+  for (const [threshold, suffix] of NUMBER_UNITS) {
+    if (n >= threshold) return `${(n / threshold).toFixed(1)}${suffix}`;
+  }
   return String(n);
 }
 
-export async function fetchDocs(params: FetchDocsParams): Promise<string> {
+export async function fetchDocs(params: FetchDocsParams): Promise<ToolResult> {
+  if (params.refresh) invalidateContext7Cache();
+  if (!Array.isArray(params.target)) {
+    return fetchDocsForTarget(params, params.target);
+  }
+  if (params.target.length === 1) {
+    return fetchDocsForTarget(params, params.target[0]);
+  }
+
+  // Each target is fetched, matched and truncated on its own, within an
+  // equal share of CHARACTER_LIMIT; results come back in request order
+  // regardless of which finishes first.
+  const targets = params.target;
+  const charLimit = Math.floor(CHARACTER_LIMIT / targets.length) - BATCH_ENTRY_OVERHEAD;
+  const results = new Array<ToolResult>(targets.length);
+  let next = 0;
+  const worker = async (): Promise<void> => {
+    while (next < targets.length) {
+      const i = next++;
+      results[i] = await fetchDocsForTarget(params, targets[i], charLimit);
+    }
+  };
+  await Promise.all(
+    Array.from({ length: Math.min(BATCH_CONCURRENCY, targets.length) }, worker),
+  );
+  // Docs bodies already end in a rule, so each section opens with a
+  // heading naming its target instead of another separator.
+  return {
+    text: results.map((r, i) => `# Target: ${targets[i]}\n\n${r.text}`).join("\n\n"),
+    isError: results.every((r) => r.isError),
+  };
+}
+
+async function fetchDocsForTarget(
+  params: FetchDocsParams,
+  target: string,
+  charLimit: number = CHARACTER_LIMIT,
+): Promise<ToolResult> {
   const fetchParams: FetchParams = {
-    target: params.target,
+    target,
+    normalizedTarget: target.toLowerCase().trim(),
     tag: params.tag,
     depth: params.depth,
+    tokens: DEPTH_TOKENS[params.depth],
     version: params.version,
     browseIndex: params.browse_index,
     responseFormat: ResponseFormat.MARKDOWN,
+    charLimit,
   };
 
+  const cacheKey = [
+    fetchParams.target,
+    fetchParams.tag ?? "",
+    fetchParams.depth,
+    fetchParams.version ?? "",
+    fetchParams.browseIndex ? "browse" : "docs",
+    fetchParams.charLimit,
+  ].join("\n");
+  const cached = responseCache.get(cacheKey);
+  if (cached !== undefined) return { text: cached, isError: false };
+
+  // Every section is held to its share of the limit, not just docs bodies;
+  // a batch of browse listings or error pages adds up too.
   try {
-    const libraries = await searchLibraries(fetchParams.target);
-    if (!libraries.length) {
-      return formatNoResults(
-        fetchParams.target,
-        fetchParams.responseFormat,
-      );
-    }
+    const response = truncateResponse(await resolveDocs(fetchParams), charLimit);
+    responseCache.set(cacheKey, response);
+    return { text: response, isError: false };
+  } catch (error) {
+    return {
+      text: truncateResponse(formatError(error, "fetch_docs"), charLimit),
+      isError: true,
+    };
+  }
+}
 
-    if (fetchParams.browseIndex) {
-      if (fetchParams.responseFormat === ResponseFormat.JSON) {
-        return formatSearchJson(libraries, fetchParams.target);
-      }
-      return formatSearchMarkdown(libraries, fetchParams.target);
-    }
+async function resolveDocs(fetchParams: FetchParams): Promise<string> {
+  const libraries = await searchLibraries(fetchParams.target);
+  if (!libraries.length) {
+    return formatNoResults(
+      fetchParams.target,
+      fetchParams.responseFormat,
+    );
+  }
 
-    const match = buildMatchResult(libraries, fetchParams.target);
-    if (!match.library) {
-      return formatNoMatch(
-        fetchParams.target,
-        match.candidates,
-        fetchParams.responseFormat,
-      );
+  if (fetchParams.browseIndex) {
+    if (fetchParams.responseFormat === ResponseFormat.JSON) {
+      return formatSearchJson(libraries, fetchParams.target);
     }
+    return formatSearchMarkdown(libraries, fetchParams.target);
+  }
 
-    const docs = await getDocumentation(
-      match.library.id,
-      fetchParams.tag,
-      DEPTH_TOKENS[fetchParams.depth],
-      fetchParams.version,
+  const match = findBestMatch(libraries, fetchParams.normalizedTarget);
+  if (!match.library) {
+    return formatNoMatch(
+      fetchParams.target,
+      match.candidates,
+      fetchParams.responseFormat,
     );
+  }
 
-    if (fetchParams.responseFormat === ResponseFormat.JSON) {
-      return formatDocsJson(docs, fetchParams);
-    }
-    return formatDocsMarkdown(docs, fetchParams);
-  } catch (error) {
-    return formatError(error, "fetch_docs");
+  const docs = await getDocumentation(
+    match.library.id,
+    fetchParams.tag,
+    fetchParams.tokens,
+    fetchParams.version,
+  );
+
+  if (fetchParams.responseFormat === ResponseFormat.JSON) {
+    return formatDocsJson(docs, fetchParams);
   }
+  return formatDocsMarkdown(docs, fetchParams);
 }
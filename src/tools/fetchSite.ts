@@ -1,6 +1,8 @@
 import fs from "node:fs/promises";
 import path from "node:path";
 import dns from "node:dns/promises";
+import http from "node:http";
+import https from "node:https";
 import net from "node:net";
 import { URL } from "node:url";
 
@@ -10,6 +12,8 @@ import { Readability } from "@mozilla/readability";
 import TurndownService from "turndown";
 import sharp from "sharp";
 
+import type { ToolResult } from "../types.js";
+
 const CHARACTER_LIMIT = 25_000;
 const FETCH_TIMEOUT_MS = Number(process.env.FETCH_SITE_TIMEOUT_MS ?? 12_000);
 const MAX_REDIRECTS = Number(process.env.FETCH_SITE_MAX_REDIRECTS ?? 3);
@@ -22,6 +26,14 @@ const MAX_IMAGE_BYTES = Number(
 const DEFAULT_CONTENT_DIR = "./context";
 const DISABLE_SSRF_GUARD = process.env.FETCH_SITE_DISABLE_SSRF_GUARD === "1";
 
+// One client for page, robots.txt and image requests. Batch fetches and a
+// page's images mostly hit the same few hosts, so keep-alive sockets save a
+// TCP + TLS handshake per request.
+const siteHttp = axios.create({
+  httpAgent: new http.Agent({ keepAlive: true, maxSockets: 16 }),
+  httpsAgent: new https.Agent({ keepAlive: true, maxSockets: 16 }),
+});
+
 export interface FetchSiteParams {
   url: string | string[];
   images: boolean;
@@ -225,7 +237,7 @@ async function fetchWithLimits(url: string): Promise<{
     let response: Awaited<ReturnType<typeof axios.get<any>>> | null = null;
 
     while (redirects <= MAX_REDIRECTS) {
-      const res = await axios.get(currentUrl, {
+      const res = await siteHttp.get(currentUrl, {
         responseType: "arraybuffer",
         maxContentLength: MAX_HTML_BYTES,
         validateStatus: (status) => status >= 200 && status < 400,
@@ -271,7 +283,7 @@ async function checkRobotsTxt(url: string): Promise<void> {
   try {
     const u = new URL(url);
     const robotsUrl = `${u.origin}/robots.txt`;
-    const res = await axios.get(robotsUrl, {
+    const res = await siteHttp.get(robotsUrl, {
       timeout: FETCH_TIMEOUT_MS,
       validateStatus: (s) => s >= 200 && s < 500,
     });
@@ -342,7 +354,7 @@ function extractContent(html: string, url: string): ExtractedContent {
 async function fetchImage(url: string, referer: string): Promise<Buffer | null> {
   try {
     await validateUrlSafety(url);
-    const response = await axios.get(url, {
+    const response = await siteHttp.get(url, {
       responseType: "arraybuffer",
       headers: { Referer: referer },
       maxContentLength: MAX_IMAGE_BYTES,
@@ -481,13 +493,15 @@ async function processSingleUrl(
   }
 }
 
-export async function fetchSite(params: FetchSiteParams): Promise<string> {
+export async function fetchSite(params: FetchSiteParams): Promise<ToolResult> {
   const urls = Array.isArray(params.url) ? params.url : [params.url];
   if (urls.length > 10) {
-    return (
-      "Error: Maximum 10 URLs per batch.\n\n" +
-      `You provided ${urls.length} URLs. Please split into smaller batches.`
-    );
+    return {
+      text:
+        "Error: Maximum 10 URLs per batch.\n\n" +
+        `You provided ${urls.length} URLs. Please split into smaller batches.`,
+      isError: true,
+    };
   }
 
   const contentDir = DEFAULT_CONTENT_DIR;
@@ -503,7 +517,10 @@ export async function fetchSite(params: FetchSiteParams): Promise<string> {
     );
 
     if (!result.success) {
-      return `Error fetching ${result.url}:\n\n${result.message}`;
+      return {
+        text: `Error fetching ${result.url}:\n\n${result.message}`,
+        isError: true,
+      };
     }
 
     const parts: string[] = [];
@@ -523,7 +540,7 @@ export async function fetchSite(params: FetchSiteParams): Promise<string> {
     if (result.imageCount && result.imageCount > 0) {
       parts.push(`🖼️ ${result.imageCount} images saved`);
     }
-    return parts.join("\n");
+    return { text: parts.join("\n"), isError: false };
   }
 
   const results = await Promise.all(
@@ -564,5 +581,5 @@ export async function fetchSite(params: FetchSiteParams): Promise<string> {
     out.push("", `**Total images:** ${totalImages}`);
   }
 
-  return out.join("\n");
+  return { text: out.join("\n"), isError: !successful.length };
 }
@@ -0,0 +1,10 @@
+/**
+ * What a tool function hands back to the MCP layer in index.ts.
+ * Tools decide `isError` where the failure happens instead of the server
+ * guessing it from the rendered text.
+ */
+export interface ToolResult {
+  readonly text: string;
+  /** The call failed; finding nothing is not an error. */
+  readonly isError: boolean;
+}